@@ -4,55 +4,109 @@
 """
 
 import os
-import uuid
-import re
-
-def generate_uuid():
-    """生成 Xcode 格式的 24 位十六进制 UUID"""
-    return uuid.uuid4().hex[:24].upper()
+import binascii
+from concurrent.futures import ThreadPoolExecutor
+
+# pbxproj 中各插入位置的定位标记
+_REF_SECTION = (b'/* Begin PBXFileReference section */', b'\n/* End PBXFileReference section */')
+_BUILD_SECTION = (b'/* Begin PBXBuildFile section */', b'\n/* End PBXBuildFile section */')
+_SOURCES_GROUP = (b'080E96DDFE201D6D7F000001 /* Sources */ = {', b'children = (')
+_SOURCES_PHASE = (b'8D11072C0486CEB800E47090 /* Sources */ = {', b'files = (')
+
+# PBXFileReference / PBXBuildFile 条目模板
+_REF_TMPL = "\t\t%s /* %s */ = {isa = PBXFileReference; lastKnownFileType = sourcecode.swift; name = %s; path = %s; sourceTree = \"<group>\"; };"
+_BUILD_TMPL = "\t\t%s /* %s in Sources */ = {isa = PBXBuildFile; fileRef = %s /* %s */; };"
+# Sources 组 children / 编译阶段 files 列表项模板
+_GROUP_CHILD_TMPL = "\n\t\t\t\t%s /* %s */,"
+_PHASE_FILE_TMPL = "\n\t\t\t\t%s /* %s in Sources */,"
+
+def generate_uuids(n):
+    """批量生成 n 个 Xcode 格式的 24 位十六进制 UUID
+
+    一次性读取全部随机字节，避免每个 UUID 都单独取一次熵
+    """
+    hx = binascii.hexlify(os.urandom(12 * n)).upper().decode('ascii')
+    return [hx[i:i + 24] for i in range(0, 24 * n, 24)]
+
+def _scan(root, rel='', prune=None):
+    """基于 os.scandir 的递归遍历，逐个产出 (条目, 相对路径)
+
+    prune 为目录名后缀，匹配的目录本身会被产出但不再深入
+    """
+    # 每个目录只计算一次前缀，条目的相对路径直接拼接得到
+    prefix = rel + '/' if rel else ''
+    try:
+        it = os.scandir(root)
+    except OSError:
+        # 与 os.walk 默认行为一致：目录不存在或不可读时静默跳过
+        return
+    with it:
+        for entry in it:
+            entry_rel = prefix + entry.name
+            yield entry, entry_rel
+            if entry.is_dir(follow_symlinks=False) and not (prune and entry.name.endswith(prune)):
+                yield from _scan(entry.path, entry_rel, prune)
 
 def find_all_swift_files(directory):
     """递归查找所有 Swift 文件"""
-    swift_files = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.swift'):
-                full_path = os.path.join(root, file)
-                rel_path = os.path.relpath(full_path, directory)
-                swift_files.append(rel_path)
+    swift_files = [
+        rel_path for entry, rel_path in _scan(directory)
+        if entry.is_file(follow_symlinks=False) and entry.name.endswith('.swift')
+    ]
     return sorted(swift_files)
 
-def find_all_resource_files(directory):
-    """递归查找所有资源文件"""
-    resource_files = []
-    extensions = ['.lproj', '.strings', '.js', '.py', '.json', '.icns']
+def _iter_resources(directory):
+    """逐个产出资源文件/目录，.lproj 目录整体算一项且不再深入"""
+    extensions = ('.lproj', '.strings', '.js', '.py', '.json', '.icns')
 
-    for root, dirs, files in os.walk(directory):
-        # 处理 .lproj 目录
-        if root.endswith('.lproj'):
-            rel_path = os.path.relpath(root, directory)
-            resource_files.append((rel_path, 'folder'))
-            continue
+    for entry, rel_path in _scan(directory, prune='.lproj'):
+        if entry.is_dir() and entry.name.endswith('.lproj'):
+            yield rel_path, 'folder'
+        elif entry.is_file() and entry.name.endswith(extensions):
+            yield rel_path, 'file'
 
-        for file in files:
-            # 检查文件扩展名
-            if any(file.endswith(ext) for ext in extensions):
-                full_path = os.path.join(root, file)
-                rel_path = os.path.relpath(full_path, directory)
-                resource_files.append((rel_path, 'file'))
-
-    return sorted(resource_files)
+def count_resource_files(directory):
+    """统计资源文件/目录数量（资源不写入项目，仅用于输出统计）"""
+    return sum(1 for _ in _iter_resources(directory))
 
 def read_pbxproj(path):
-    """读取 pbxproj 文件"""
-    with open(path, 'r', encoding='utf-8') as f:
-        return f.read()
+    """以字节形式读取 pbxproj 文件，返回可原地修改的 bytearray"""
+    with open(path, 'rb') as f:
+        return bytearray(f.read())
 
 def write_pbxproj(path, content):
     """写入 pbxproj 文件"""
-    with open(path, 'w', encoding='utf-8') as f:
+    with open(path, 'wb') as f:
         f.write(content)
 
+def find_section_end(content, markers):
+    """返回 section 结束标记的位置（即插入点），找不到时返回 -1"""
+    begin, end = markers
+    start = content.find(begin)
+    if start < 0:
+        return -1
+    return content.find(end, start + len(begin))
+
+def find_list_end(content, markers):
+    """返回对象中列表结尾 ');' 的位置（即插入点），找不到时返回 -1"""
+    header, key = markers
+    start = content.find(header)
+    if start < 0:
+        return -1
+    list_start = content.find(key, start + len(header))
+    # 列表必须属于该对象本身，不能越过对象结尾
+    if list_start < 0 or content.find(b'}', start + len(header), list_start) >= 0:
+        return -1
+    return content.find(b');', list_start + len(key))
+
+def apply_edits(content, edits):
+    """在 bytearray 中原地插入所有修改
+
+    从后往前插入，保证前面记录的偏移量不受影响
+    """
+    for offset, text in sorted(edits, key=lambda edit: edit[0], reverse=True):
+        content[offset:offset] = text.encode('utf-8')
+
 def add_files_to_project():
     """添加文件到项目"""
     project_root = '/Users/xcl/rime/squirrel_llm'
@@ -66,92 +120,79 @@ def add_files_to_project():
     window_manager = 'sources/AIPluginWindowManager.swift'
     resources_dir = f'{project_root}/Resources/AIPlugins'
 
-    print("\n🔍 扫描 AIPlugins 源文件...")
-    swift_files = find_all_swift_files(aiplugins_dir)
-    print(f"   找到 {len(swift_files)} 个 Swift 文件")
+    # 两个目录树互不相关，并行扫描以重叠目录读取的系统调用
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        swift_future = executor.submit(find_all_swift_files, aiplugins_dir)
+        resource_future = executor.submit(count_resource_files, resources_dir)
 
-    print("\n🔍 扫描 AIPlugins 资源文件...")
-    resource_files = find_all_resource_files(resources_dir)
-    print(f"   找到 {len(resource_files)} 个资源文件/目录")
+        print("\n🔍 扫描 AIPlugins 源文件...")
+        swift_files = swift_future.result()
+        print(f"   找到 {len(swift_files)} 个 Swift 文件")
+
+        print("\n🔍 扫描 AIPlugins 资源文件...")
+        resource_count = resource_future.result()
+        print(f"   找到 {resource_count} 个资源文件/目录")
 
     # 2. 生成 PBXFileReference
     file_references = []
     build_file_refs = []
+    group_children = []
+    phase_files = []
+
+    # 窗口管理器和每个 Swift 文件各需要两个 UUID
+    uuids = generate_uuids(2 * len(swift_files) + 2)
 
     # 添加窗口管理器
-    wm_uuid = generate_uuid()
-    wm_build_uuid = generate_uuid()
-    file_references.append(
-        f"\t\t{wm_uuid} /* AIPluginWindowManager.swift */ = {{isa = PBXFileReference; lastKnownFileType = sourcecode.swift; name = AIPluginWindowManager.swift; path = sources/AIPluginWindowManager.swift; sourceTree = \"<group>\"; }};"
-    )
-    build_file_refs.append(
-        f"\t\t{wm_build_uuid} /* AIPluginWindowManager.swift in Sources */ = {{isa = PBXBuildFile; fileRef = {wm_uuid} /* AIPluginWindowManager.swift */; }};"
-    )
+    wm_uuid = uuids.pop()
+    wm_build_uuid = uuids.pop()
+    wm_name = os.path.basename(window_manager)
+    file_references.append(_REF_TMPL % (wm_uuid, wm_name, wm_name, window_manager))
+    build_file_refs.append(_BUILD_TMPL % (wm_build_uuid, wm_name, wm_uuid, wm_name))
+    group_children.append(_GROUP_CHILD_TMPL % (wm_uuid, wm_name))
+    phase_files.append(_PHASE_FILE_TMPL % (wm_build_uuid, wm_name))
 
     # 添加 AIPlugins Swift 文件
-    swift_uuid_map = {}
-    for swift_file in swift_files:
-        file_name = os.path.basename(swift_file)
-        file_uuid = generate_uuid()
-        build_uuid = generate_uuid()
-        swift_uuid_map[swift_file] = file_uuid
-
-        file_references.append(
-            f"\t\t{file_uuid} /* {file_name} */ = {{isa = PBXFileReference; lastKnownFileType = sourcecode.swift; name = {file_name}; path = sources/AIPlugins/{swift_file}; sourceTree = \"<group>\"; }};"
-        )
-        build_file_refs.append(
-            f"\t\t{build_uuid} /* {file_name} in Sources */ = {{isa = PBXBuildFile; fileRef = {file_uuid} /* {file_name} */; }};"
-        )
+    # 每个文件的 (相对路径, 文件名, 文件 UUID, 编译 UUID) 只计算一次，后续各处复用
+    swift_items = [(swift_file, os.path.basename(swift_file), uuids.pop(), uuids.pop()) for swift_file in swift_files]
+    for swift_file, file_name, file_uuid, build_uuid in swift_items:
+        file_references.append(_REF_TMPL % (file_uuid, file_name, file_name, 'sources/AIPlugins/' + swift_file))
+        build_file_refs.append(_BUILD_TMPL % (build_uuid, file_name, file_uuid, file_name))
+        phase_files.append(_PHASE_FILE_TMPL % (build_uuid, file_name))
 
     # 3. 插入到文件中
     print("\n✏️  修改项目文件...")
 
+    # 先收集 (插入位置, 插入文本)，最后一次性拼接
+    edits = []
+
     # 在 PBXFileReference section 中添加
-    ref_section_match = re.search(r'(/\* Begin PBXFileReference section \*/.*?)(\n/\* End PBXFileReference section \*/)', content, re.DOTALL)
-    if ref_section_match:
-        ref_content = ref_section_match.group(1)
-        new_ref_content = ref_content + '\n' + '\n'.join(file_references) + '\n'
-        content = content.replace(ref_section_match.group(1), new_ref_content)
+    ref_insert_point = find_section_end(content, _REF_SECTION)
+    if ref_insert_point >= 0:
+        edits.append((ref_insert_point, '\n' + '\n'.join(file_references) + '\n'))
         print("   ✓ 添加文件引用")
 
     # 在 PBXBuildFile section 中添加
-    build_section_match = re.search(r'(/\* Begin PBXBuildFile section \*/.*?)(\n/\* End PBXBuildFile section \*/)', content, re.DOTALL)
-    if build_section_match:
-        build_content = build_section_match.group(1)
-        new_build_content = build_content + '\n' + '\n'.join(build_file_refs) + '\n'
-        content = content.replace(build_section_match.group(1), new_build_content)
+    build_insert_point = find_section_end(content, _BUILD_SECTION)
+    if build_insert_point >= 0:
+        edits.append((build_insert_point, '\n' + '\n'.join(build_file_refs) + '\n'))
         print("   ✓ 添加编译引用")
 
     # 在 Sources group 中添加
-    sources_group_match = re.search(r'(080E96DDFE201D6D7F000001 /\* Sources \*/ = \{.*?children = \()(.*?)(\);)', content, re.DOTALL)
-    if sources_group_match:
-        children = sources_group_match.group(2)
-        # 添加窗口管理器
-        new_child = f"\n\t\t\t\t{wm_uuid} /* AIPluginWindowManager.swift */,"
-        new_children = children + new_child
-        content = content.replace(sources_group_match.group(2), new_children)
+    sources_group_insert_point = find_list_end(content, _SOURCES_GROUP)
+    if sources_group_insert_point >= 0:
+        # 只有窗口管理器加入 Sources 组
+        edits.append((sources_group_insert_point, ''.join(group_children)))
         print("   ✓ 添加到 Sources 组")
 
     # 在 Sources build phase 中添加
-    sources_phase_match = re.search(r'(8D11072C0486CEB800E47090 /\* Sources \*/ = \{.*?files = \()(.*?)(\);)', content, re.DOTALL)
-    if sources_phase_match:
-        files = sources_phase_match.group(2)
+    sources_phase_insert_point = find_list_end(content, _SOURCES_PHASE)
+    if sources_phase_insert_point >= 0:
         # 添加所有编译文件
-        new_files_list = [f"\n\t\t\t\t{wm_build_uuid} /* AIPluginWindowManager.swift in Sources */,"]
-        for swift_file in swift_files:
-            file_name = os.path.basename(swift_file)
-            # 从 build_file_refs 中找到对应的 UUID
-            for ref in build_file_refs:
-                if file_name in ref and ' in Sources ' in ref:
-                    uuid_match = re.search(r'([A-F0-9]{24})', ref)
-                    if uuid_match:
-                        new_files_list.append(f"\n\t\t\t\t{uuid_match.group(1)} /* {file_name} in Sources */,")
-                    break
-
-        new_files = files + ''.join(new_files_list)
-        content = content.replace(sources_phase_match.group(2), new_files)
+        edits.append((sources_phase_insert_point, ''.join(phase_files)))
         print("   ✓ 添加到编译阶段")
 
+    apply_edits(content, edits)
+
     # 4. 保存文件
     print("\n💾 保存项目文件...")
     write_pbxproj(pbxproj_path, content)
@@ -160,7 +201,7 @@ def add_files_to_project():
     print("\n✅ 完成！")
     print(f"\n📊 统计:")
     print(f"   - 添加源文件: {len(swift_files) + 1} 个")
-    print(f"   - 添加资源: {len(resource_files)} 个")
+    print(f"   - 添加资源: {resource_count} 个")
 
 if __name__ == '__main__':
     try:
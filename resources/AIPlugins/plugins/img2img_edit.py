@@ -1,112 +1,176 @@
 #!/usr/bin/env python3
 """
-Qwen Image Edit CLI
-Command-line tool for image-to-image editing using Qwen-Image-Edit-2509 model
+Qwen Image Edit Worker
+Long-lived worker for image-to-image editing using Qwen-Image-Edit-2509 model.
+Reads one JSON request per line on stdin and writes JSON status/result lines to stdout,
+each tagged with the request's 'request_id' (when given) so the host can route it.
+Input images are passed as file paths ('image_paths'), and the edited image is
+written to a temporary PNG whose path is returned as 'image_path'.
 """
 
 import os
 import sys
 import json
-import base64
-import io
+import secrets
+import tempfile
 import torch
 from PIL import Image
 from diffusers import QwenImageEditPlusPipeline
 
-def base64_to_image(base64_str):
-    """Convert base64 string to PIL Image"""
-    image_data = base64.b64decode(base64_str)
-    image = Image.open(io.BytesIO(image_data))
-    return image.convert('RGB')
+try:
+    import orjson
+    json_dumps, json_loads = orjson.dumps, orjson.loads
+except ImportError:
+    json_dumps, json_loads = (lambda obj: json.dumps(obj).encode('utf-8')), json.loads
 
-def image_to_base64(image):
-    """Convert PIL Image to base64 string"""
-    buffer = io.BytesIO()
-    image.save(buffer, format='PNG')
-    base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    return base64_str
+# Diagnostic status messages are only emitted with AIPLUGIN_DEBUG=1
+DEBUG = os.environ.get('AIPLUGIN_DEBUG') == '1'
 
-def main():
-    # Read input from stdin with debug info
-    print(json.dumps({'status': 'starting', 'python_version': sys.version}), flush=True, file=sys.stderr)
+def jlog(obj, stream=sys.stderr):
+    """Write one JSON line to a stream without going through the text layer"""
+    stream.buffer.write(json_dumps(obj))
+    stream.buffer.write(b'\n')
+    stream.flush()
 
-    try:
-        input_text = sys.stdin.read()
-        print(json.dumps({'status': 'input_read', 'length': len(input_text)}), flush=True, file=sys.stderr)
-
-        input_data = json.loads(input_text)
-        print(json.dumps({'status': 'json_parsed', 'keys': list(input_data.keys())}), flush=True, file=sys.stderr)
-    except json.JSONDecodeError as e:
-        error_result = {'status': 'error', 'error': f'JSON parse error: {str(e)}'}
-        print(json.dumps(error_result), flush=True)
-        sys.exit(1)
-    except Exception as e:
-        error_result = {'status': 'error', 'error': f'Input read error: {str(e)}'}
-        print(json.dumps(error_result), flush=True)
-        sys.exit(1)
+# Id of the request being handled, echoed on every stdout line
+_request_id = None
+
+def reply(obj):
+    """Write one status/result line for the current request to stdout"""
+    if _request_id is not None:
+        obj['request_id'] = _request_id
+    jlog(obj, sys.stdout)
+
+# The pipeline works at roughly 1024x1024 pixels of area, so larger inputs are
+# reduced while decoding; the size cap keeps enough headroom for wide aspect ratios
+DRAFT_SIZE = (1024, 1024)
+MAX_INPUT_DIM = 2048
+
+def load_image(path):
+    """Load an image file as an RGB PIL Image, downscaling oversized inputs"""
+    image = Image.open(path)
+    # Lets the JPEG decoder skip DCT work while keeping both sides >= DRAFT_SIZE;
+    # no-op for other formats
+    image.draft('RGB', DRAFT_SIZE)
+    image = image.convert('RGB')
+    image.thumbnail((MAX_INPUT_DIM, MAX_INPUT_DIM), Image.Resampling.LANCZOS)
+    return image
+
+# zlib level per 'compression' request field; the result is decoded right away,
+# so 'fast' is the default (Pillow-SIMD speeds up PNG filtering further if installed)
+PNG_COMPRESS_LEVELS = {'fast': 1, 'archive': 9}
+
+def save_image(image, compression='fast'):
+    """Save PIL Image to a temporary PNG file and return its path"""
+    compress_level = PNG_COMPRESS_LEVELS.get(compression, PNG_COMPRESS_LEVELS['fast'])
+    with tempfile.NamedTemporaryFile(prefix='img2img_', suffix='.png', delete=False) as f:
+        image.save(f, format='PNG', compress_level=compress_level, optimize=False)
+        return f.name
+
+def load_pipeline():
+    """Select device, load the Qwen pipeline and create its generator (done once per worker)"""
+    reply({'status': 'loading_model'})
+
+    if torch.cuda.is_available():
+        device = "cuda"
+        torch_dtype = torch.bfloat16
+    elif torch.backends.mps.is_available():
+        device = "mps"
+        torch_dtype = torch.float32
+    else:
+        device = "cpu"
+        torch_dtype = torch.float32
+
+    if DEBUG:
+        jlog({'status': 'device_selected', 'device': device})
+
+    # Load pipeline; the loading flags restate diffusers' defaults when safetensors
+    # and accelerate are installed, so they change nothing there but make a missing
+    # dependency an error instead of a slower fallback (keep HF_HOME on a fast disk)
+    pipeline = QwenImageEditPlusPipeline.from_pretrained(
+        "Qwen/Qwen-Image-Edit-2509",
+        torch_dtype=torch_dtype,
+        use_safetensors=True,
+        low_cpu_mem_usage=True
+    )
+    if DEBUG:
+        jlog({'status': 'pipeline_loaded'})
+
+    pipeline = pipeline.to(device)
+    pipeline.set_progress_bar_config(disable=True)
+
+    if device == "cuda" and os.environ.get('AIPLUGIN_TORCH_COMPILE') == '1':
+        # Opt-in: the working resolution follows each request's aspect ratio, so
+        # compile with dynamic shapes in the default mode. This avoids a recompile
+        # per new shape and the extra CUDA-graph memory pools "reduce-overhead"
+        # would keep for a ~20B transformer, at the cost of a smaller speedup and
+        # a slow first request
+        pipeline.transformer = torch.compile(pipeline.transformer, dynamic=True, fullgraph=False)
+
+    if device == "mps" or os.environ.get('AIPLUGIN_LOW_VRAM') == '1':
+        # Decode batched latents one image at a time to reduce peak memory (MPS
+        # shares unified memory with the rest of the system); output is unchanged
+        pipeline.vae.enable_slicing()
+
+    if os.environ.get('AIPLUGIN_LOW_VRAM') == '1':
+        # Tiled decoding saves more memory but blends tile overlaps, which can
+        # change the output slightly and slows decoding, so it is opt-in
+        pipeline.vae.enable_tiling()
+
+    # Reused across requests; each request only reseeds it
+    generator = torch.Generator(device=device)
+
+    reply({'status': 'model_loaded', 'device': device})
+    return pipeline, generator
+
+def validate_request(input_data):
+    """Return an error message for a request that cannot be run, else None
 
-    # Parse parameters
-    images_base64 = input_data['images']
+    Checked before the pipeline is loaded, so a bad first request fails fast.
+    """
+    image_paths = input_data.get('image_paths')
+    if not isinstance(image_paths, list):
+        return "Request is missing 'image_paths' (list of input image files)"
+    if not image_paths:
+        return 'At least one input image is required'
+    if not isinstance(input_data.get('prompt'), str):
+        return "Request is missing 'prompt' (edit instruction text)"
+    return None
+
+def edit_image(pipeline, generator, input_data):
+    """Run one edit request against an already loaded pipeline"""
+    # Parse parameters (validated by validate_request)
+    image_paths = input_data['image_paths']
     prompt = input_data['prompt']
     negative_prompt = input_data.get('negative_prompt', ' ')
     num_inference_steps = input_data.get('num_inference_steps', 40)
     true_cfg_scale = input_data.get('true_cfg_scale', 4.0)
     guidance_scale = input_data.get('guidance_scale', 1.0)
     seed = input_data.get('seed', -1)
+    compression = input_data.get('compression', 'fast')
 
-    print(json.dumps({'status': 'params_parsed', 'num_images': len(images_base64)}), flush=True, file=sys.stderr)
-
-    # Print progress
-    print(json.dumps({'status': 'loading_model'}), flush=True)
+    if DEBUG:
+        jlog({'status': 'params_parsed', 'num_images': len(image_paths)})
 
-    # Determine device and dtype
+    # Load input images
+    if DEBUG:
+        reply({'status': 'processing_images'})
     try:
-        if torch.cuda.is_available():
-            device = "cuda"
-            torch_dtype = torch.bfloat16
-        elif torch.backends.mps.is_available():
-            device = "mps"
-            torch_dtype = torch.float32
-        else:
-            device = "cpu"
-            torch_dtype = torch.float32
-
-        print(json.dumps({'status': 'device_selected', 'device': device}), flush=True, file=sys.stderr)
-
-        # Load pipeline
-        pipeline = QwenImageEditPlusPipeline.from_pretrained(
-            "Qwen/Qwen-Image-Edit-2509",
-            torch_dtype=torch_dtype
-        )
-        print(json.dumps({'status': 'pipeline_loaded'}), flush=True, file=sys.stderr)
-
-        pipeline = pipeline.to(device)
-        pipeline.set_progress_bar_config(disable=True)
-
-        print(json.dumps({'status': 'model_loaded', 'device': device}), flush=True)
+        input_images = [load_image(path) for path in image_paths]
+        if DEBUG:
+            jlog({'status': 'images_decoded', 'count': len(input_images)})
     except Exception as e:
-        error_result = {'status': 'error', 'error': f'Model loading error: {str(e)}'}
-        print(json.dumps(error_result), flush=True)
-        sys.exit(1)
-
-    # Convert base64 to images
-    print(json.dumps({'status': 'processing_images'}), flush=True)
-    try:
-        input_images = [base64_to_image(img_b64) for img_b64 in images_base64]
-        print(json.dumps({'status': 'images_decoded', 'count': len(input_images)}), flush=True, file=sys.stderr)
-    except Exception as e:
-        error_result = {'status': 'error', 'error': f'Image decode error: {str(e)}'}
-        print(json.dumps(error_result), flush=True)
-        sys.exit(1)
+        return {'status': 'error', 'error': f'Image decode error: {str(e)}'}
 
     # Setup generator
     if seed < 0:
-        seed = torch.randint(0, 2**32 - 1, (1,)).item()
-    generator = torch.Generator(device=device).manual_seed(seed)
+        seed = secrets.randbits(32)
+    generator.manual_seed(seed)
 
     # Prepare inputs
     inputs = {
-        "image": input_images if len(input_images) > 1 else input_images[0],
+        # Always a list, so single- and multi-image requests take the same path
+        "image": input_images,
         "prompt": prompt,
         "negative_prompt": negative_prompt,
         "num_inference_steps": num_inference_steps,
@@ -117,20 +181,20 @@ def main():
     }
 
     # Generate
-    print(json.dumps({'status': 'generating', 'steps': num_inference_steps}), flush=True)
+    reply({'status': 'generating', 'steps': num_inference_steps})
 
     with torch.inference_mode():
         output = pipeline(**inputs)
         output_image = output.images[0]
 
-    # Convert to base64
-    print(json.dumps({'status': 'encoding_result'}), flush=True)
-    result_base64 = image_to_base64(output_image)
+    # Write result image
+    if DEBUG:
+        reply({'status': 'encoding_result'})
+    result_path = save_image(output_image, compression)
 
-    # Output result
-    result = {
+    return {
         'status': 'complete',
-        'image': result_base64,
+        'image_path': result_path,
         'metadata': {
             'prompt': prompt,
             'num_images': len(input_images),
@@ -141,7 +205,76 @@ def main():
         }
     }
 
-    print(json.dumps(result), flush=True)
+def main():
+    """Persistent worker: read one JSON request per line until stdin closes
+
+    The pipeline is loaded on the first request and reused for every
+    following one, so only the first edit pays the model load cost.
+    """
+    if DEBUG:
+        jlog({'status': 'starting', 'python_version': sys.version})
+
+    global _request_id
+    pipeline = None
+    generator = None
+
+    while True:
+        _request_id = None
+        try:
+            input_text = sys.stdin.buffer.readline()
+        except Exception as e:
+            error_result = {'status': 'error', 'error': f'Input read error: {str(e)}'}
+            reply(error_result)
+            sys.exit(1)
+
+        if not input_text:
+            break
+        if not input_text.strip():
+            # Answer blank lines too, so every line written gets exactly one terminal reply
+            reply({'status': 'error', 'error': 'Empty request line'})
+            continue
+
+        if DEBUG:
+            jlog({'status': 'input_read', 'length': len(input_text)})
+
+        # A bad request line must not take down the worker and its loaded model;
+        # ValueError also covers JSONDecodeError and UnicodeDecodeError
+        try:
+            input_data = json_loads(input_text)
+        except ValueError as e:
+            error_result = {'status': 'error', 'error': f'JSON parse error: {str(e)}'}
+            reply(error_result)
+            continue
+
+        if not isinstance(input_data, dict):
+            error_result = {'status': 'error', 'error': 'Request must be a JSON object'}
+            reply(error_result)
+            continue
+
+        _request_id = input_data.get('request_id')
+
+        if DEBUG:
+            jlog({'status': 'json_parsed', 'keys': list(input_data.keys())})
+
+        error = validate_request(input_data)
+        if error:
+            reply({'status': 'error', 'error': error})
+            continue
+
+        if pipeline is None:
+            try:
+                pipeline, generator = load_pipeline()
+            except Exception as e:
+                error_result = {'status': 'error', 'error': f'Model loading error: {str(e)}'}
+                reply(error_result)
+                continue
+
+        try:
+            result = edit_image(pipeline, generator, input_data)
+        except Exception as e:
+            result = {'status': 'error', 'error': str(e)}
+
+        reply(result)
 
 if __name__ == '__main__':
     try:
@@ -151,5 +284,5 @@ if __name__ == '__main__':
             'status': 'error',
             'error': str(e)
         }
-        print(json.dumps(error_result), flush=True)
+        reply(error_result)
         sys.exit(1)
@@ -0,0 +1,369 @@
+import Foundation
+
+/// Uses the venv python if available, otherwise falls back to system python
+func pythonExecutablePath() -> String {
+    let venvPython = FileManager.default.homeDirectoryForCurrentUser
+        .appendingPathComponent("rime/ai_plugins/venv/bin/python3")
+    return FileManager.default.fileExists(atPath: venvPython.path)
+        ? venvPython.path
+        : "/usr/bin/python3"
+}
+
+/// Keeps one long-lived worker per script for the whole input method session,
+/// shared by every plugin tab, and stops workers that have been idle for a while
+final class PythonWorkerPool: @unchecked Sendable {
+    static let shared = PythonWorkerPool()
+
+    /// An idle worker is stopped after this long so a loaded model does not stay
+    /// resident in the input method process indefinitely
+    private let idleTimeout: TimeInterval = 10 * 60
+
+    private let queue = DispatchQueue(label: "PythonWorkerPool")
+    private var workers: [String: PythonWorker] = [:]
+
+    /// Sends one request to the script's worker; output is routed back to `bridge`
+    func send(_ requestData: Data, toScript scriptPath: String, from bridge: WebViewBridge) {
+        queue.async {
+            guard let json = try? JSONSerialization.jsonObject(with: requestData) as? [String: Any] else {
+                print("PythonWorkerPool: ERROR - Request is not a JSON object")
+                bridge.sendPythonScriptError("Invalid request: input must be a JSON object")
+                return
+            }
+            guard let request = PythonWorker.Request(json: json) else {
+                bridge.sendPythonScriptError("Failed to prepare input images: invalid image data or temporary files could not be written")
+                return
+            }
+
+            let worker: PythonWorker
+            do {
+                worker = try self.worker(for: scriptPath)
+            } catch {
+                print("PythonWorkerPool: EXCEPTION when running Python script: \(error)")
+                print("PythonWorkerPool: Error description: \(error.localizedDescription)")
+                PythonWorker.removeFiles(request.stagedImages)
+                bridge.sendPythonScriptError("Failed to execute: \(error.localizedDescription)")
+                return
+            }
+            worker.idleTimer?.cancel()
+            worker.idleTimer = nil
+
+            // Recorded before writing so a reply is routable as soon as it arrives
+            worker.addPendingRequest(request, from: bridge)
+            do {
+                print("PythonWorkerPool: Writing \(request.line.count) bytes to Python worker PID \(worker.process.processIdentifier)")
+                try worker.input.write(contentsOf: request.line)
+            } catch {
+                print("PythonWorkerPool: Failed to write request to Python worker: \(error)")
+                // If the worker died, its termination handler may already have reported the request
+                guard worker.removePendingRequest(request.id) else { return }
+                bridge.sendPythonScriptError("Failed to execute: \(error.localizedDescription)")
+                self.scheduleIdleStop(worker)
+            }
+        }
+    }
+
+    /// Returns the running worker for a script, starting one if needed.
+    /// Must be called on `queue`.
+    private func worker(for scriptPath: String) throws -> PythonWorker {
+        if let worker = workers[scriptPath], worker.process.isRunning, !worker.isStopping {
+            return worker
+        }
+
+        let process = Process()
+        let pythonPath = pythonExecutablePath()
+
+        print("PythonWorkerPool: Using Python at: \(pythonPath)")
+        process.executableURL = URL(fileURLWithPath: pythonPath)
+        process.arguments = [scriptPath]
+
+        let inputPipe = Pipe()
+        let outputPipe = Pipe()
+        let errorPipe = Pipe()
+
+        process.standardInput = inputPipe
+        process.standardOutput = outputPipe
+        process.standardError = errorPipe
+
+        // Writing to a worker that has just exited must fail with EPIPE instead of
+        // raising SIGPIPE, which would terminate the input method
+        _ = fcntl(inputPipe.fileHandleForWriting.fileDescriptor, F_SETNOSIGPIPE, 1)
+
+        let worker = PythonWorker(process: process, input: inputPipe.fileHandleForWriting)
+
+        // Read output line by line and forward each line to the tab that sent the request
+        outputPipe.fileHandleForReading.readabilityHandler = { [weak self] handle in
+            let data = handle.availableData
+            guard data.count > 0 else { return }
+            for rawLine in worker.appendOutput(data) {
+                print("PythonWorkerPool: Python output: \(rawLine.prefix(200))")
+                let (line, bridge, finished) = worker.finishOutput(rawLine)
+                if bridge == nil {
+                    print("PythonWorkerPool: No waiting tab for output line, dropping it")
+                }
+                DispatchQueue.main.async {
+                    bridge?.sendPythonScriptOutput(line)
+                }
+                if finished {
+                    self?.queue.async { self?.scheduleIdleStop(worker) }
+                }
+            }
+        }
+
+        // Drain stderr continuously so a long-lived worker never blocks on a full pipe
+        errorPipe.fileHandleForReading.readabilityHandler = { handle in
+            let data = handle.availableData
+            guard data.count > 0, let errorOutput = String(data: data, encoding: .utf8) else { return }
+            print("PythonWorkerPool: Python stderr: \(errorOutput)")
+            worker.appendError(errorOutput)
+        }
+
+        process.terminationHandler = { [weak self] process in
+            // The worker owns the process, so drop the handler to break the cycle
+            process.terminationHandler = nil
+            outputPipe.fileHandleForReading.readabilityHandler = nil
+            errorPipe.fileHandleForReading.readabilityHandler = nil
+
+            print("PythonWorkerPool: Python process terminated with status: \(process.terminationStatus)")
+
+            self?.queue.async {
+                worker.idleTimer?.cancel()
+                worker.idleTimer = nil
+                if self?.workers[scriptPath] === worker {
+                    self?.workers[scriptPath] = nil
+                }
+            }
+
+            let bridges = worker.abandonPendingRequests()
+            guard !bridges.isEmpty else { return }
+
+            var errorMessage = "Python worker exited before finishing the request"
+            if process.terminationStatus != 0 {
+                print("PythonWorkerPool: Python script FAILED with exit code: \(process.terminationStatus)")
+                errorMessage = worker.errorOutput
+                if errorMessage.isEmpty {
+                    errorMessage = "Python script failed with exit code \(process.terminationStatus)"
+                }
+            }
+            DispatchQueue.main.async {
+                for bridge in bridges {
+                    bridge.sendPythonScriptError(errorMessage)
+                }
+            }
+        }
+
+        print("PythonWorkerPool: Starting Python process with arguments: \(process.arguments ?? [])")
+        try process.run()
+        print("PythonWorkerPool: Python process started, PID: \(process.processIdentifier)")
+
+        workers[scriptPath] = worker
+        return worker
+    }
+
+    /// Stops the worker after `idleTimeout` unless a new request arrives first.
+    /// Must be called on `queue`.
+    private func scheduleIdleStop(_ worker: PythonWorker) {
+        guard !worker.hasPendingRequests, !worker.isStopping else { return }
+        worker.idleTimer?.cancel()
+        let stop = DispatchWorkItem { [weak worker] in
+            guard let worker = worker, !worker.hasPendingRequests else { return }
+            print("PythonWorkerPool: Stopping idle Python worker PID \(worker.process.processIdentifier)")
+            worker.isStopping = true
+            // Closing stdin lets the worker exit at EOF
+            try? worker.input.close()
+        }
+        worker.idleTimer = stop
+        queue.asyncAfter(deadline: .now() + idleTimeout, execute: stop)
+    }
+}
+
+// MARK: - Python Worker
+
+/// A running Python script that reads newline-delimited JSON requests on stdin
+/// and tags every output line with the id of the request it belongs to
+private final class PythonWorker: @unchecked Sendable {
+    /// One request line ready to be written to the worker
+    struct Request {
+        let id: String
+        let line: Data
+        let stagedImages: [URL]
+
+        /// Assigns a request id and, if the request carries base64 `images`, writes
+        /// them to temp files and replaces them with `image_paths`, so the worker
+        /// reads images straight from disk. The request is always re-serialized,
+        /// which guarantees it is written as exactly one line. Fails if the images
+        /// cannot be staged; the worker only accepts `image_paths`, so such a
+        /// request could never succeed.
+        init?(json: [String: Any]) {
+            var json = json
+            var files: [URL] = []
+
+            if let images = json["images"] as? [String] {
+                for image in images {
+                    let url = FileManager.default.temporaryDirectory
+                        .appendingPathComponent("squirrel-img2img-\(UUID().uuidString)")
+                    guard let imageData = Data(base64Encoded: image),
+                        (try? imageData.write(to: url)) != nil
+                    else {
+                        print("PythonWorker: Failed to stage input image")
+                        PythonWorker.removeFiles(files)
+                        return nil
+                    }
+                    files.append(url)
+                }
+                json["images"] = nil
+                json["image_paths"] = files.map(\.path)
+            }
+
+            let id = UUID().uuidString
+            json["request_id"] = id
+            guard var line = try? JSONSerialization.data(withJSONObject: json) else {
+                PythonWorker.removeFiles(files)
+                return nil
+            }
+            // Workers read one JSON request per line
+            line.append(0x0A)
+
+            self.id = id
+            self.line = line
+            self.stagedImages = files
+        }
+    }
+
+    /// A request written to the worker and not yet answered
+    private struct PendingRequest {
+        weak var bridge: WebViewBridge?
+        var stagedImages: [URL]
+    }
+
+    /// Only the tail of stderr is kept for error reports
+    private static let maxErrorOutputLength = 16 * 1024
+
+    let process: Process
+    let input: FileHandle
+
+    /// Accessed on the pool queue only
+    var idleTimer: DispatchWorkItem?
+    var isStopping = false
+
+    private let lock = NSLock()
+    private var outputBuffer = Data()
+    private var stderrText = ""
+    /// Unanswered requests keyed by request id
+    private var pendingRequests: [String: PendingRequest] = [:]
+
+    init(process: Process, input: FileHandle) {
+        self.process = process
+        self.input = input
+    }
+
+    var errorOutput: String {
+        lock.lock()
+        defer { lock.unlock() }
+        return stderrText
+    }
+
+    var hasPendingRequests: Bool {
+        lock.lock()
+        defer { lock.unlock() }
+        return !pendingRequests.isEmpty
+    }
+
+    /// Appends stdout data and returns the complete lines received so far
+    func appendOutput(_ data: Data) -> [String] {
+        lock.lock()
+        defer { lock.unlock() }
+        outputBuffer.append(data)
+        guard let lastNewline = outputBuffer.lastIndex(of: 0x0A) else { return [] }
+        let complete = outputBuffer[outputBuffer.startIndex..<lastNewline]
+        outputBuffer = Data(outputBuffer[outputBuffer.index(after: lastNewline)...])
+        let output = String(data: complete, encoding: .utf8) ?? ""
+        return output.components(separatedBy: "\n").filter { !$0.isEmpty }
+    }
+
+    func appendError(_ text: String) {
+        lock.lock()
+        defer { lock.unlock() }
+        stderrText += text
+        if stderrText.count > Self.maxErrorOutputLength {
+            stderrText = String(stderrText.suffix(Self.maxErrorOutputLength))
+        }
+    }
+
+    /// Records a request from `bridge` so output tagged with its id reaches that tab
+    func addPendingRequest(_ request: Request, from bridge: WebViewBridge) {
+        lock.lock()
+        pendingRequests[request.id] = PendingRequest(bridge: bridge, stagedImages: request.stagedImages)
+        lock.unlock()
+    }
+
+    /// Forgets a request that was never delivered and removes its staged images.
+    /// Returns false if it was no longer pending.
+    func removePendingRequest(_ id: String) -> Bool {
+        lock.lock()
+        let request = pendingRequests.removeValue(forKey: id)
+        lock.unlock()
+        guard let request = request else { return false }
+        Self.removeFiles(request.stagedImages)
+        return true
+    }
+
+    /// Resolves which tab an output line belongs to from its `request_id`; lines
+    /// without a known id get no bridge. Once a request reaches a terminal status
+    /// its staged images are removed and an `image_path` result is inlined as
+    /// base64 `image` for the WebView.
+    func finishOutput(_ line: String) -> (line: String, bridge: WebViewBridge?, finished: Bool) {
+        guard let data = line.data(using: .utf8),
+            var result = try? JSONSerialization.jsonObject(with: data) as? [String: Any],
+            let id = result["request_id"] as? String
+        else { return (line, nil, false) }
+
+        lock.lock()
+        let bridge = pendingRequests[id]?.bridge
+        lock.unlock()
+
+        guard let status = result["status"] as? String,
+            status == "complete" || status == "error"
+        else { return (line, bridge, false) }
+
+        lock.lock()
+        let files = pendingRequests.removeValue(forKey: id)?.stagedImages ?? []
+        lock.unlock()
+        Self.removeFiles(files)
+
+        guard let imagePath = result["image_path"] as? String else { return (line, bridge, true) }
+        let imageURL = URL(fileURLWithPath: imagePath)
+        defer { try? FileManager.default.removeItem(at: imageURL) }
+
+        if let imageData = try? Data(contentsOf: imageURL) {
+            result["image"] = imageData.base64EncodedString()
+        } else {
+            print("PythonWorker: Failed to read result image at \(imagePath)")
+            // The WebView treats "complete" as success, so this must become an error
+            result["status"] = "error"
+            result["error"] = "Failed to read result image"
+        }
+        result["image_path"] = nil
+
+        guard let json = try? JSONSerialization.data(withJSONObject: result),
+            let output = String(data: json, encoding: .utf8)
+        else { return (#"{"status":"error","error":"Failed to encode result"}"#, bridge, true) }
+        return (output, bridge, true)
+    }
+
+    /// Drops every unanswered request, removing its staged images, and returns
+    /// the tabs still waiting on them
+    func abandonPendingRequests() -> [WebViewBridge] {
+        lock.lock()
+        let requests = Array(pendingRequests.values)
+        pendingRequests.removeAll()
+        lock.unlock()
+        Self.removeFiles(requests.flatMap { $0.stagedImages })
+        return requests.compactMap { $0.bridge }
+    }
+
+    static func removeFiles(_ files: [URL]) {
+        for file in files {
+            try? FileManager.default.removeItem(at: file)
+        }
+    }
+}
@@ -10,6 +10,11 @@ class WebViewBridge: NSObject, WKScriptMessageHandler, @unchecked Sendable {
     weak var webView: WKWebView?
     var settings: AppSettings?
 
+    /// Scripts that run as long-lived workers (see `PythonWorkerPool`) reading one
+    /// JSON request per line; every other script is spawned per request and reads
+    /// stdin until EOF
+    private static let persistentPythonScripts: Set<String> = ["img2img_edit.py"]
+
     init(tabId: UUID, settings: AppSettings?) {
         self.tabId = tabId
         self.settings = settings
@@ -121,105 +126,101 @@ class WebViewBridge: NSObject, WKScriptMessageHandler, @unchecked Sendable {
             print("WebViewBridge: Input JSON length: \(input.count) characters")
             print("WebViewBridge: Input JSON preview: \(String(input.prefix(200)))...")
 
-            let process = Process()
-
-            // Try to use venv python if available, otherwise fall back to system python
-            let venvPython = FileManager.default.homeDirectoryForCurrentUser
-                .appendingPathComponent("rime/ai_plugins/venv/bin/python3")
-            let pythonPath = FileManager.default.fileExists(atPath: venvPython.path)
-                ? venvPython.path
-                : "/usr/bin/python3"
-
-            print("WebViewBridge: Using Python at: \(pythonPath)")
-            process.executableURL = URL(fileURLWithPath: pythonPath)
-            process.arguments = [scriptPath]
-
-            let inputPipe = Pipe()
-            let outputPipe = Pipe()
-            let errorPipe = Pipe()
-
-            process.standardInput = inputPipe
-            process.standardOutput = outputPipe
-            process.standardError = errorPipe
+            guard Self.persistentPythonScripts.contains(scriptName) else {
+                self.runOneShotPythonScript(scriptPath: scriptPath, input: input)
+                return
+            }
 
-            // Write JSON input to stdin
-            if let inputData = input.data(using: .utf8) {
-                print("WebViewBridge: Writing \(inputData.count) bytes to Python stdin")
-                inputPipe.fileHandleForWriting.write(inputData)
-                inputPipe.fileHandleForWriting.closeFile()
-                print("WebViewBridge: Input pipe closed")
-            } else {
+            guard let requestData = input.data(using: .utf8) else {
                 print("WebViewBridge: ERROR - Failed to convert input to UTF8 data")
+                return
             }
 
-            // Read output line by line for progress updates
-            outputPipe.fileHandleForReading.readabilityHandler = { handle in
-                let data = handle.availableData
-                if data.count > 0, let output = String(data: data, encoding: .utf8) {
-                    // Split by newlines and process each line
-                    let lines = output.components(separatedBy: "\n").filter { !$0.isEmpty }
-                    for line in lines {
-                        print("WebViewBridge: Python output: \(line)")
-                        // Escape the output for JavaScript
-                        let escapedOutput = line
-                            .replacingOccurrences(of: "\\", with: "\\\\")
-                            .replacingOccurrences(of: "'", with: "\\'")
-                            .replacingOccurrences(of: "\n", with: "\\n")
-                            .replacingOccurrences(of: "\r", with: "\\r")
-                        let script = "window.onPythonScriptOutput?.('\(escapedOutput)')"
-                        DispatchQueue.main.async {
-                            self.callJavaScript(script)
-                        }
+            PythonWorkerPool.shared.send(requestData, toScript: scriptPath, from: self)
+        }
+    }
+
+    /// Spawns the script, writes the input to stdin, closes it and waits for exit
+    private func runOneShotPythonScript(scriptPath: String, input: String) {
+        let process = Process()
+        let pythonPath = pythonExecutablePath()
+
+        print("WebViewBridge: Using Python at: \(pythonPath)")
+        process.executableURL = URL(fileURLWithPath: pythonPath)
+        process.arguments = [scriptPath]
+
+        let inputPipe = Pipe()
+        let outputPipe = Pipe()
+        let errorPipe = Pipe()
+
+        process.standardInput = inputPipe
+        process.standardOutput = outputPipe
+        process.standardError = errorPipe
+
+        // Write JSON input to stdin
+        if let inputData = input.data(using: .utf8) {
+            print("WebViewBridge: Writing \(inputData.count) bytes to Python stdin")
+            inputPipe.fileHandleForWriting.write(inputData)
+            inputPipe.fileHandleForWriting.closeFile()
+            print("WebViewBridge: Input pipe closed")
+        } else {
+            print("WebViewBridge: ERROR - Failed to convert input to UTF8 data")
+        }
+
+        // Read output line by line for progress updates
+        outputPipe.fileHandleForReading.readabilityHandler = { handle in
+            let data = handle.availableData
+            if data.count > 0, let output = String(data: data, encoding: .utf8) {
+                // Split by newlines and process each line
+                let lines = output.components(separatedBy: "\n").filter { !$0.isEmpty }
+                for line in lines {
+                    print("WebViewBridge: Python output: \(line)")
+                    DispatchQueue.main.async {
+                        self.sendPythonScriptOutput(line)
                     }
                 }
             }
+        }
 
-            do {
-                print("WebViewBridge: Starting Python process with arguments: \(process.arguments ?? [])")
-                try process.run()
-
-                print("WebViewBridge: Python process started, PID: \(process.processIdentifier)")
-                process.waitUntilExit()
+        do {
+            print("WebViewBridge: Starting Python process with arguments: \(process.arguments ?? [])")
+            try process.run()
 
-                // Read all error output
-                let errorData = errorPipe.fileHandleForReading.readDataToEndOfFile()
-                let errorOutput = String(data: errorData, encoding: .utf8) ?? ""
+            print("WebViewBridge: Python process started, PID: \(process.processIdentifier)")
+            process.waitUntilExit()
 
-                print("WebViewBridge: Python process terminated with status: \(process.terminationStatus)")
+            // Read all error output
+            let errorData = errorPipe.fileHandleForReading.readDataToEndOfFile()
+            let errorOutput = String(data: errorData, encoding: .utf8) ?? ""
 
-                if !errorOutput.isEmpty {
-                    print("WebViewBridge: Python stderr output:")
-                    print("--- START STDERR ---")
-                    print(errorOutput)
-                    print("--- END STDERR ---")
-                }
+            print("WebViewBridge: Python process terminated with status: \(process.terminationStatus)")
 
-                if process.terminationStatus != 0 {
-                    print("WebViewBridge: Python script FAILED with exit code: \(process.terminationStatus)")
+            if !errorOutput.isEmpty {
+                print("WebViewBridge: Python stderr output:")
+                print("--- START STDERR ---")
+                print(errorOutput)
+                print("--- END STDERR ---")
+            }
 
-                    var errorMessage = errorOutput
-                    if errorMessage.isEmpty {
-                        errorMessage = "Python script failed with exit code \(process.terminationStatus)"
-                    }
+            if process.terminationStatus != 0 {
+                print("WebViewBridge: Python script FAILED with exit code: \(process.terminationStatus)")
 
-                    let escapedError = errorMessage
-                        .replacingOccurrences(of: "\\", with: "\\\\")
-                        .replacingOccurrences(of: "'", with: "\\'")
-                        .replacingOccurrences(of: "\n", with: "\\n")
-                    let errorScript = "window.onPythonScriptError?.('\(escapedError)')"
-                    DispatchQueue.main.async {
-                        self.callJavaScript(errorScript)
-                    }
-                } else {
-                    print("WebViewBridge: Python script completed successfully (exit code 0)")
+                var errorMessage = errorOutput
+                if errorMessage.isEmpty {
+                    errorMessage = "Python script failed with exit code \(process.terminationStatus)"
                 }
-            } catch {
-                print("WebViewBridge: EXCEPTION when running Python script: \(error)")
-                print("WebViewBridge: Error description: \(error.localizedDescription)")
-                let errorScript = "window.onPythonScriptError?.('Failed to execute: \(error.localizedDescription)')"
+
                 DispatchQueue.main.async {
-                    self.callJavaScript(errorScript)
+                    self.sendPythonScriptError(errorMessage)
                 }
+            } else {
+                print("WebViewBridge: Python script completed successfully (exit code 0)")
+            }
+        } catch {
+            print("WebViewBridge: EXCEPTION when running Python script: \(error)")
+            print("WebViewBridge: Error description: \(error.localizedDescription)")
+            DispatchQueue.main.async {
+                self.sendPythonScriptError("Failed to execute: \(error.localizedDescription)")
             }
         }
     }
@@ -425,6 +426,24 @@ class WebViewBridge: NSObject, WKScriptMessageHandler, @unchecked Sendable {
         callJavaScript("window.onStreamChunk?.('\(escapedChunk)')")
     }
 
+    func sendPythonScriptOutput(_ line: String) {
+        // Escape the output for JavaScript
+        let escapedOutput = line
+            .replacingOccurrences(of: "\\", with: "\\\\")
+            .replacingOccurrences(of: "'", with: "\\'")
+            .replacingOccurrences(of: "\n", with: "\\n")
+            .replacingOccurrences(of: "\r", with: "\\r")
+        callJavaScript("window.onPythonScriptOutput?.('\(escapedOutput)')")
+    }
+
+    func sendPythonScriptError(_ message: String) {
+        let escapedError = message
+            .replacingOccurrences(of: "\\", with: "\\\\")
+            .replacingOccurrences(of: "'", with: "\\'")
+            .replacingOccurrences(of: "\n", with: "\\n")
+        callJavaScript("window.onPythonScriptError?.('\(escapedError)')")
+    }
+
     func sendComplete(error: String? = nil) {
         if let error = error {
             let escapedError =